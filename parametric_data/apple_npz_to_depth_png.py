@@ -23,7 +23,7 @@ import sys
 import numpy as np
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Convert per-frame NPZ depth files to FoundationPose depth PNGs (16-bit mm)."
     )
@@ -50,7 +50,7 @@ def main():
         default=65535.0,
         help="Depth values above this (mm) are clamped; output is always 16-bit (default: 65535)",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     input_dir = os.path.abspath(args.input_dir)
     if not os.path.isdir(input_dir):
@@ -20,7 +20,7 @@ import sys
 import numpy as np
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Average per-frame intrinsics from depth.npz and save cam_K.txt.",
     )
@@ -35,7 +35,7 @@ def main():
         default=None,
         help="Output path for cam_K.txt (default: same directory as npz, file cam_K.txt)",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     npz_path = os.path.abspath(args.npz_path)
     if not os.path.isfile(npz_path):
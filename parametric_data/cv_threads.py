@@ -0,0 +1,17 @@
+"""
+OpenCV thread-pool size for the frame-processing scripts (process_videos, video_to_hand_joints).
+
+Those scripts already overlap decode / detect / encode on their own threads (and MediaPipe runs
+its own inference threads), so OpenCV's default pool of one thread per logical core only
+oversubscribes the CPU. Set OPENCV_THREADS to override the default.
+"""
+
+import os
+
+
+def opencv_threads() -> int:
+    """OpenCV worker threads: $OPENCV_THREADS if set, else half the logical cores (about one per physical core)."""
+    try:
+        return max(1, int(os.environ["OPENCV_THREADS"]))
+    except (KeyError, ValueError):
+        return max(1, (os.cpu_count() or 2) // 2)
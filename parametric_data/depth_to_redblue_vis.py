@@ -3,18 +3,92 @@
 Visualize depth PNG(s) as red-blue images: red = near, blue = far.
 By default uses absolute depth mapping (same depth value = same color across all images).
 Use --relative to scale per image (min/max of each image).
+Use --colormap jet|turbo|viridis for an OpenCV colormap instead (near = high end of the map, e.g. red for jet/turbo).
 
 Usage:
     python depth_to_redblue_vis.py /path/to/depth/000104.png
     python depth_to_redblue_vis.py /path/to/depth --min-depth 300 --max-depth 2000  # explicit range (mm)
     python depth_to_redblue_vis.py /path/to/depth --relative  # per-image scale (old behavior)
+    python depth_to_redblue_vis.py /path/to/depth --relative --clip-percentile 4  # per-image 4th..96th percentile
+    python depth_to_redblue_vis.py /path/to/depth --colormap turbo
 """
 
 import argparse
+import functools
+import json
 import os
 import glob
+
+import cv2
 import numpy as np
-from PIL import Image
+from PIL import Image, PngImagePlugin
+
+COLORMAPS = {
+    "redblue": None,
+    "jet": cv2.COLORMAP_JET,
+    "turbo": cv2.COLORMAP_TURBO,
+    "viridis": cv2.COLORMAP_VIRIDIS,
+}
+
+# PNG text chunk holding the render options of each output, so an output is only reused for the same options.
+SETTINGS_KEY = "depth_vis"
+
+
+def _palette(colormap: str) -> np.ndarray:
+    """(256, 3) uint8 RGB colors for gradient steps 0 (near) .. 255 (far)."""
+    step = np.arange(256, dtype=np.uint8)
+    if COLORMAPS[colormap] is None:
+        palette = np.zeros((256, 3), dtype=np.uint8)
+        palette[:, 0] = 255 - step
+        palette[:, 2] = step
+        return palette
+    # applyColorMap returns BGR; reverse the ramp so near maps to the high (red/bright) end
+    bgr = cv2.applyColorMap((255 - step).reshape(256, 1), COLORMAPS[colormap])
+    return np.ascontiguousarray(bgr[:, 0, ::-1])
+
+
+@functools.lru_cache(maxsize=8)
+def _rb_lut(depth_min_mm: float, depth_max_mm: float, colormap: str = "redblue") -> np.ndarray:
+    """(65536, 3) uint8 color table indexed by depth (mm): depth_min_mm -> near color, depth_max_mm -> far color,
+    0 -> black. Cached so absolute mode builds it once per run; coloring an image is then a single lookup."""
+    if depth_max_mm <= depth_min_mm:
+        depth_max_mm = depth_min_mm + 1.0
+    # Bin every possible depth into 256 gradient steps, then map steps through the palette.
+    bins = np.linspace(depth_min_mm, depth_max_mm, 257, dtype=np.float32)
+    step = np.digitize(np.arange(65536, dtype=np.float32), bins) - 1
+    step = np.clip(step, 0, 255).astype(np.uint8)
+    lut = _palette(colormap)[step]
+    lut[0] = 0  # invalid depth
+    lut.flags.writeable = False
+    return lut
+
+
+def load_depth(depth_path: str) -> np.ndarray:
+    """Read a depth PNG (mm) as a uint8/uint16 array usable as a LUT index (libpng via OpenCV, 16-bit preserved)."""
+    d = cv2.imread(depth_path, cv2.IMREAD_ANYDEPTH)
+    if d is None:
+        raise OSError(f"Could not read depth image: {depth_path}")
+    if d.dtype != np.uint16 and d.dtype != np.uint8:
+        d = np.clip(d, 0, 65535).astype(np.uint16)
+    return d
+
+
+def depth_range(d: np.ndarray) -> tuple[float, float] | None:
+    """(min, max) over valid (> 0) depth in one masked pass, or None if no pixel is valid."""
+    if cv2.countNonZero(d) == 0:
+        return None
+    d_min, d_max, _, _ = cv2.minMaxLoc(d, mask=(d > 0).view(np.uint8))
+    return d_min, d_max
+
+
+def depth_percentile_range(d: np.ndarray, percentile: float) -> tuple[float, float] | None:
+    """(lo, hi) = (P, 100-P) percentiles of valid (> 0) depth, so a few outlier pixels don't stretch the ramp.
+    Uses the partition-based 'lower' method (no full sort). None if no pixel is valid."""
+    vals = d[d > 0]
+    if vals.size == 0:
+        return None
+    lo, hi = np.percentile(vals, [percentile, 100.0 - percentile], method="lower")
+    return float(lo), float(hi)
 
 
 def depth_to_redblue(
@@ -23,29 +97,45 @@ def depth_to_redblue(
     *,
     depth_min_mm: float,
     depth_max_mm: float,
+    depth: np.ndarray | None = None,
+    colormap: str = "redblue",
+    settings: str | None = None,
 ) -> None:
-    """Map depth (mm) to red-blue: depth_min_mm -> red, depth_max_mm -> blue. Same value = same color."""
-    d = np.array(Image.open(depth_path))
-    valid = d > 0
-    if not np.any(valid):
+    """Map depth (mm) to red-blue: depth_min_mm -> red, depth_max_mm -> blue. Same value = same color.
+    Pass depth (from load_depth) to skip re-reading depth_path; colormap picks another palette (see COLORMAPS).
+    settings is stored in the PNG's SETTINGS_KEY text chunk (see rendered_settings)."""
+    pnginfo = None
+    if settings is not None:
+        pnginfo = PngImagePlugin.PngInfo()
+        pnginfo.add_text(SETTINGS_KEY, settings)
+    d = load_depth(depth_path) if depth is None else depth
+    if not np.any(d):
         rgb = np.zeros((*d.shape, 3), dtype=np.uint8)
-        Image.fromarray(rgb).save(output_path)
+        Image.fromarray(rgb).save(output_path, pnginfo=pnginfo)
         print(f"{depth_path} -> {output_path} (no valid depth)")
         return
-    span = depth_max_mm - depth_min_mm
-    if span <= 0:
-        span = 1.0
-    t = np.zeros_like(d, dtype=np.float64)
-    t[valid] = (d[valid].astype(np.float64) - depth_min_mm) / span
-    t[valid] = np.clip(t[valid], 0.0, 1.0)
-    rgb = np.zeros((*d.shape, 3), dtype=np.uint8)
-    rgb[valid, 0] = (255 * (1 - t[valid])).astype(np.uint8)
-    rgb[valid, 1] = 0
-    rgb[valid, 2] = (255 * t[valid]).astype(np.uint8)
-    rgb[~valid] = 0
+    lut = _rb_lut(float(depth_min_mm), float(depth_max_mm), colormap)
+    if d.dtype == np.uint8:
+        # 8-bit depth: OpenCV's SIMD table lookup over the first 256 entries beats numpy fancy indexing
+        rgb = cv2.LUT(cv2.merge((d, d, d)), lut[:256].reshape(256, 1, 3))
+    else:
+        rgb = lut[d]
     os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    Image.fromarray(rgb).save(output_path)
-    print(f"{depth_path} -> {output_path}  (red={depth_min_mm} mm, blue={depth_max_mm} mm)")
+    Image.fromarray(rgb).save(output_path, pnginfo=pnginfo)
+    if colormap == "redblue":
+        print(f"{depth_path} -> {output_path}  (red={depth_min_mm} mm, blue={depth_max_mm} mm)")
+    else:
+        print(f"{depth_path} -> {output_path}  ({colormap}: near={depth_min_mm} mm, far={depth_max_mm} mm)")
+
+
+def rendered_settings(output_path: str) -> str | None:
+    """Render options stored in an output PNG by depth_to_redblue, or None (missing, unreadable or untagged).
+    Only the header chunks are parsed; the text chunk precedes the image data."""
+    try:
+        with Image.open(output_path) as im:
+            return im.info.get(SETTINGS_KEY)
+    except (OSError, ValueError):
+        return None
 
 
 def main():
@@ -80,7 +170,32 @@ def main():
         action="store_true",
         help="Scale per image (min/max of each image) instead of absolute depth range",
     )
+    parser.add_argument(
+        "--clip-percentile",
+        type=float,
+        default=None,
+        metavar="P",
+        help="With --relative: use the P and 100-P percentiles of each image instead of min/max (e.g. 4)",
+    )
+    parser.add_argument(
+        "--colormap",
+        type=str,
+        choices=list(COLORMAPS),
+        default="redblue",
+        help="Color palette (default: redblue). jet/turbo/viridis use OpenCV colormaps for more contrast",
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Re-render every image (default: skip outputs newer than their depth PNG when rendered with the "
+        "same options)",
+    )
     args = parser.parse_args()
+    if args.clip_percentile is not None:
+        if not args.relative:
+            parser.error("--clip-percentile requires --relative")
+        if not 0.0 <= args.clip_percentile < 50.0:
+            parser.error("--clip-percentile must be in [0, 50)")
 
     if os.path.isfile(args.input):
         paths = [args.input]
@@ -98,23 +213,53 @@ def main():
         print(f"Not a file or directory: {args.input}", flush=True)
         return 1
 
+    settings = json.dumps(
+        {
+            "colormap": args.colormap,
+            "min_depth": args.min_depth,
+            "max_depth": args.max_depth,
+            "relative": args.relative,
+            "clip_percentile": args.clip_percentile,
+        },
+        sort_keys=True,
+    )
+
+    skipped = 0
     for p in paths:
         name = os.path.basename(p)
         out_path = os.path.join(args.output_dir, name)
+        # An output is up to date if it is newer than its depth PNG and was rendered with the same options
+        if (
+            not args.overwrite
+            and os.path.isfile(out_path)
+            and os.path.getmtime(out_path) >= os.path.getmtime(p)
+            and rendered_settings(out_path) == settings
+        ):
+            skipped += 1
+            continue
         if args.relative:
-            d = np.array(Image.open(p))
-            valid = d > 0
-            if np.any(valid):
-                d_min, d_max = float(d[valid].min()), float(d[valid].max())
-                depth_to_redblue(p, out_path, depth_min_mm=d_min, depth_max_mm=d_max)
+            d = load_depth(p)
+            if args.clip_percentile is not None:
+                d_range = depth_percentile_range(d, args.clip_percentile)
+            else:
+                d_range = depth_range(d)
+            if d_range is not None:
+                d_min, d_max = d_range
+                depth_to_redblue(p, out_path, depth_min_mm=d_min, depth_max_mm=d_max, depth=d,
+                                 colormap=args.colormap, settings=settings)
             else:
-                depth_to_redblue(p, out_path, depth_min_mm=0.0, depth_max_mm=1.0)
+                depth_to_redblue(p, out_path, depth_min_mm=0.0, depth_max_mm=1.0, depth=d,
+                                 colormap=args.colormap, settings=settings)
         else:
             depth_to_redblue(
                 p, out_path,
                 depth_min_mm=args.min_depth,
                 depth_max_mm=args.max_depth,
+                colormap=args.colormap,
+                settings=settings,
             )
+    if skipped:
+        print(f"Skipped {skipped} up-to-date image(s) in {args.output_dir} (use --overwrite to re-render)")
     return 0
 
 
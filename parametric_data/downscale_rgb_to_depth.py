@@ -8,17 +8,29 @@ Usage:
     python downscale_rgb_to_depth.py /path/to/redbull/depth.npz --rgb-dir /path/to/redbull/rgb
 
 Reads depth shape (N, H, W) from depth.npz; resizes each image in rgb/ to (W, H)
-and overwrites it. Uses cv2.INTER_AREA for downscaling.
+and overwrites it. Uses cv2.INTER_AREA for downscaling. Images already at (W, H)
+are left untouched, so reruns are cheap.
 """
 
 import argparse
 import os
 import sys
 
-import numpy as np
+from npz_io import npz_array_shape
 
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
 
-def main():
+
+def _png_size(path: str) -> tuple[int, int] | None:
+    """(width, height) from a PNG's IHDR chunk without decoding pixels; None if not a PNG."""
+    with open(path, "rb") as f:
+        head = f.read(24)
+    if len(head) < 24 or head[:8] != PNG_SIGNATURE or head[12:16] != b"IHDR":
+        return None
+    return int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big")
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Downscale RGB frames to depth resolution (in-place).",
     )
@@ -33,19 +45,18 @@ def main():
         default=None,
         help="Directory containing RGB PNGs (default: <npz_dir>/rgb)",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     npz_path = os.path.abspath(args.npz_path)
     if not os.path.isfile(npz_path):
         print(f"Error: File not found: {npz_path}", file=sys.stderr)
         sys.exit(1)
 
-    data = np.load(npz_path)
-    if "depth" not in data:
+    depth_shape = npz_array_shape(npz_path, "depth")  # header only; no decompression
+    if depth_shape is None:
         print("Error: npz must contain 'depth' array.", file=sys.stderr)
         sys.exit(1)
-    n_depth, h, w = data["depth"].shape
-    data.close()
+    n_depth, h, w = depth_shape
     target_size = (w, h)  # cv2 resize (width, height)
 
     if args.rgb_dir is None:
@@ -73,15 +84,22 @@ def main():
         name_iter = tqdm(names, desc="Downscale RGB", unit="frame")
     except ImportError:
         name_iter = names
+    n_skipped = 0
     for name in name_iter:
         path = os.path.join(rgb_dir, name)
+        if _png_size(path) == target_size:
+            n_skipped += 1
+            continue
         img = cv2.imread(path)
         if img is None:
             print(f"Warning: Could not read {path}", file=sys.stderr)
             continue
+        if img.shape[1] == w and img.shape[0] == h:
+            n_skipped += 1
+            continue
         resized = cv2.resize(img, target_size, interpolation=cv2.INTER_AREA)
         cv2.imwrite(path, resized)
-    print(f"Downscaled {len(names)} RGB frames to {w}x{h}")
+    print(f"Downscaled {len(names) - n_skipped} RGB frames to {w}x{h} ({n_skipped} already at that size)")
 
 
 if __name__ == "__main__":
@@ -6,20 +6,75 @@ single mesh with .vertices / .vertex_normals).
 
 Usage:
     python export_single_mesh_obj.py /path/to/input.obj [/path/to/output.obj]
-    If output is omitted, writes to <input_stem>_single.obj in the same directory.
+    python export_single_mesh_obj.py /path/to/input.obj --format ply   # binary PLY (much faster to write than ASCII OBJ)
+    If output is omitted, writes to <input_stem>_single.<format> in the same directory.
+    An explicit output path keeps its extension; without --format the format follows it.
 """
 
 import argparse
 import os
 import sys
 
+import numpy as np
+
+from mesh_io import has_vertex_normals
+
+# --format -> (file extension, trimesh file_type)
+EXPORT_FORMATS = {
+    "obj": (".obj", "obj"),
+    "ply": (".ply", "ply"),  # trimesh writes binary PLY by default
+    "glb": (".glb", "glb"),
+}
+
+
+def concatenate_geometries(geoms, normals=False):
+    """Merge Trimesh geometries into one mesh by stacking vertices/faces (and, with normals=True, the vertex
+    normals loaded from the file) into preallocated buffers, faces offset by the running vertex count.
+    process=False skips trimesh's merge/cleanup pass. Geometries with a visual (UV texture or colours) or
+    non-Trimesh geometries go through trimesh.util.concatenate instead, which merges those too."""
+    import trimesh
+    geoms = list(geoms)
+    if not all(isinstance(g, trimesh.Trimesh) and g.visual.kind is None for g in geoms):
+        return trimesh.util.concatenate(geoms)
+    n_verts = sum(g.vertices.shape[0] for g in geoms)
+    n_faces = sum(g.faces.shape[0] for g in geoms)
+    vertices = np.empty((n_verts, 3), dtype=np.float64)
+    faces = np.empty((n_faces, 3), dtype=np.int64)
+    vertex_normals = np.empty((n_verts, 3), dtype=np.float64) if normals else None
+    v_off = f_off = 0
+    for g in geoms:
+        nv, nf = g.vertices.shape[0], g.faces.shape[0]
+        vertices[v_off:v_off + nv] = g.vertices
+        if normals:
+            vertex_normals[v_off:v_off + nv] = g.vertex_normals
+        np.add(g.faces, v_off, out=faces[f_off:f_off + nf])
+        v_off += nv
+        f_off += nf
+    return trimesh.Trimesh(vertices=vertices, faces=faces, vertex_normals=vertex_normals, process=False)
+
 
 def main():
     parser = argparse.ArgumentParser(description="Export OBJ as single mesh (merge Scene).")
     parser.add_argument("input_obj", type=str, help="Input OBJ path")
-    parser.add_argument("output_obj", type=str, nargs="?", default=None, help="Output OBJ path (default: <stem>_single.obj)")
+    parser.add_argument("output_obj", type=str, nargs="?", default=None, help="Output path (default: <stem>_single.<format>)")
+    parser.add_argument("--format", type=str, choices=sorted(EXPORT_FORMATS), default=None,
+                        help="Output format: obj (ASCII), ply (binary) or glb (binary). "
+                        "Default: from the output path's extension, else obj")
     args = parser.parse_args()
 
+    outpath = os.path.abspath(args.output_obj) if args.output_obj else None
+    file_type = None  # None = let trimesh infer it from outpath's extension
+    if args.format is not None:
+        ext, file_type = EXPORT_FORMATS[args.format]
+        if outpath is not None:
+            out_ext = os.path.splitext(outpath)[1]
+            if not out_ext:
+                outpath += ext
+            elif out_ext.lower() != ext:
+                parser.error(f"--format {args.format} does not match output extension {out_ext}")
+    elif outpath is None:
+        ext, file_type = EXPORT_FORMATS["obj"]
+
     try:
         import trimesh
     except ImportError:
@@ -33,21 +88,19 @@ def main():
 
     loaded = trimesh.load(inpath)
     if isinstance(loaded, trimesh.Scene):
-        mesh = trimesh.util.concatenate(list(loaded.geometry.values()))
+        mesh = concatenate_geometries(loaded.geometry.values(), normals=has_vertex_normals(inpath))
         print(f"Loaded Scene with {len(loaded.geometry)} geometries -> merged to single mesh.")
     else:
         mesh = loaded
         print("Loaded single mesh.")
 
-    if args.output_obj:
-        outpath = os.path.abspath(args.output_obj)
-    else:
+    if outpath is None:
         d = os.path.dirname(inpath)
         stem = os.path.splitext(os.path.basename(inpath))[0]
-        outpath = os.path.join(d, f"{stem}_single.obj")
+        outpath = os.path.join(d, f"{stem}_single{ext}")
 
     os.makedirs(os.path.dirname(outpath) or ".", exist_ok=True)
-    mesh.export(outpath)
+    mesh.export(outpath, file_type=file_type)
     print(f"Wrote: {outpath}")
 
 
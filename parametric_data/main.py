@@ -3,26 +3,26 @@
 
 import argparse
 import glob
+import importlib
 import os
 import shutil
 import subprocess
 import sys
 import tempfile
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
 def thin_rgb_to_match_depth(scene_dir: str, depth_npz_path: str) -> None:
     """If rgb has more frames than depth, keep evenly spaced rgb frames and renumber so counts and timing match."""
-    import numpy as np
+    from npz_io import npz_array_shape
     rgb_dir = os.path.join(scene_dir, "rgb")
     if not os.path.isdir(rgb_dir):
         return
-    data = np.load(depth_npz_path)
-    if "depth" not in data:
-        data.close()
+    depth_shape = npz_array_shape(depth_npz_path, "depth")  # header only; no decompression
+    if depth_shape is None:
         return
-    n_depth = data["depth"].shape[0]
-    data.close()
+    n_depth = depth_shape[0]
     rgb_files = sorted(glob.glob(os.path.join(rgb_dir, "*.png")))
     n_rgb = len(rgb_files)
     if n_rgb <= n_depth:
@@ -34,21 +34,152 @@ def thin_rgb_to_match_depth(scene_dir: str, depth_npz_path: str) -> None:
         keep_indices = [0]
     else:
         keep_indices = [int(round(i * (n_rgb - 1) / (n_depth - 1))) for i in range(n_depth)]
-    tmp_dir = tempfile.mkdtemp(prefix="rgb_thin_")
+    # Stage in scene_dir (same filesystem as rgb/) so kept frames are hardlinked and renamed back, never copied.
+    tmp_dir = tempfile.mkdtemp(prefix=".rgb_thin_", dir=scene_dir)
     try:
         for i, src_idx in enumerate(keep_indices):
             src = rgb_files[src_idx]
             dst = os.path.join(tmp_dir, f"{i:06d}.png")
-            shutil.copy2(src, dst)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
         for f in rgb_files:
             os.remove(f)
         for i in range(n_depth):
-            shutil.move(os.path.join(tmp_dir, f"{i:06d}.png"), os.path.join(rgb_dir, f"{i:06d}.png"))
+            os.replace(os.path.join(tmp_dir, f"{i:06d}.png"), os.path.join(rgb_dir, f"{i:06d}.png"))
     finally:
         shutil.rmtree(tmp_dir, ignore_errors=True)
     print(f"Thinned rgb from {n_rgb} to {n_depth} frames (temporal match with depth).", flush=True)
 
 
+def run_script_main(module_name: str, argv: list) -> int:
+    """Import a sibling script (e.g. npz_to_png) and run its main(argv) in this process; return its exit code.
+    Avoids paying interpreter + numpy/cv2 import startup once per pipeline step."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    module = importlib.import_module(module_name)
+    try:
+        rc = module.main(argv)
+    except SystemExit as e:
+        rc = e.code
+    if rc is None:
+        return 0
+    if isinstance(rc, int):
+        return rc
+    print(rc, file=sys.stderr)
+    return 1
+
+
+def require_scripts(script_dir: str, names: tuple) -> None:
+    """Exit with an error if any of the helper scripts names is missing from script_dir (one listing, no per-file stat)."""
+    present = set(os.listdir(script_dir))
+    missing = [name for name in names if name not in present]
+    if missing:
+        print(f"Error: {', '.join(missing)} not found in {script_dir}", file=sys.stderr)
+        sys.exit(1)
+
+
+def has_at_least_entries(path: str, count: int) -> bool:
+    """True if directory path holds >= count entries; stops scanning as soon as it knows (no full listdir)."""
+    if count <= 0:
+        return True
+    seen = 0
+    with os.scandir(path) as it:
+        for _ in it:
+            seen += 1
+            if seen >= count:
+                return True
+    return False
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hardlink src to dst (no data copied); fall back to a real copy where links aren't possible."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def run_long_way_lane(
+    batches: list,
+    *,
+    batch_size: int,
+    num_batches: int,
+    demo_args: list,
+    fp_cwd: str,
+    depth_dir: str,
+    masks_dir: str,
+    cam_K_path: str,
+    debug_dir: str,
+    depth_names: frozenset = frozenset(),
+    mask_names: frozenset = frozenset(),
+    env: dict | None = None,
+    stop: threading.Event | None = None,
+) -> int:
+    """Run FoundationPose run_demo on each (batch_idx, batch_frames) in batches, one after another, and copy
+    poses/track_vis into debug_dir. depth_names/mask_names are the file names present in depth_dir/masks_dir.
+    Returns 0, or the exit code of the first failing batch (and sets stop)."""
+    # One scratch scene reused for every batch, next to debug_dir so it shares the scene's filesystem:
+    # cam_K is linked once, per batch only the rgb/depth/mask hardlinks are swapped, and results are
+    # renamed (not copied) into debug_dir.
+    tmp = tempfile.mkdtemp(prefix=".fp_long_way_", dir=os.path.dirname(debug_dir))
+    tmp_debug = os.path.join(tmp, "output")
+    try:
+        for sub in ("rgb", "depth", "masks"):
+            os.makedirs(os.path.join(tmp, sub), exist_ok=True)
+        _link_or_copy(cam_K_path, os.path.join(tmp, "cam_K.txt"))
+        for batch_idx, batch_frames in batches:
+            if stop is not None and stop.is_set():
+                return 0
+            start = batch_idx * batch_size
+            n_batch = len(batch_frames)
+            if n_batch == 0:
+                continue
+            for j in range(batch_size):
+                local_name = f"{j:06d}.png"
+                for sub in ("rgb", "depth", "masks"):
+                    p = os.path.join(tmp, sub, local_name)
+                    if os.path.lexists(p):
+                        os.remove(p)
+            shutil.rmtree(tmp_debug, ignore_errors=True)
+            for j, src_rgb in enumerate(batch_frames):
+                local_name = f"{j:06d}.png"
+                base = os.path.basename(src_rgb)
+                _link_or_copy(src_rgb, os.path.join(tmp, "rgb", local_name))
+                if base in depth_names:
+                    _link_or_copy(os.path.join(depth_dir, base), os.path.join(tmp, "depth", local_name))
+                if base in mask_names:
+                    _link_or_copy(os.path.join(masks_dir, base), os.path.join(tmp, "masks", local_name))
+            result = subprocess.run(
+                demo_args + ["--test_scene_dir", tmp, "--debug_dir", tmp_debug],
+                cwd=fp_cwd,
+                env=env,
+            )
+            if result.returncode != 0:
+                print(f"Error: run_demo failed on frames {start}–{start + n_batch - 1}", file=sys.stderr)
+                if stop is not None:
+                    stop.set()
+                return result.returncode
+            ob_dir = os.path.join(tmp_debug, "ob_in_cam")
+            track_vis_src = os.path.join(tmp_debug, "track_vis")
+            track_vis_dst = os.path.join(debug_dir, "track_vis")
+            for j in range(n_batch):
+                src_pose = os.path.join(ob_dir, f"{j:06d}.txt")
+                if os.path.isfile(src_pose):
+                    frame_base = os.path.basename(batch_frames[j]).replace(".png", ".txt")
+                    os.replace(src_pose, os.path.join(debug_dir, "ob_in_cam", frame_base))
+                vis_src = os.path.join(track_vis_src, f"{j:06d}.png")
+                if os.path.isfile(vis_src):
+                    os.replace(vis_src, os.path.join(track_vis_dst, os.path.basename(batch_frames[j])))
+            if (batch_idx + 1) % 50 == 0 or batch_idx == 0:
+                print(f"Long-way: finished batch {batch_idx + 1}/{num_batches} (frames {start}–{start + n_batch - 1})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
 def main():
     parser = argparse.ArgumentParser(description="Parametric data pipeline or FoundationPose run_demo.")
     parser.add_argument("--option", type=int, choices=(1, 2, 3, 4), default=None,
@@ -59,6 +190,10 @@ def main():
                         help="(Option 2 only) Run FoundationPose on consecutive two-frame windows for the full sequence")
     parser.add_argument("--mesh", type=str, default=None,
                         help="(Option 2 only) Path to mesh .obj (default: first .obj in scene_dir/mesh/)")
+    parser.add_argument("--workers", type=int, default=1, metavar="K",
+                        help="(Option 2 --long_way only) Run K FoundationPose batches concurrently (default: 1)")
+    parser.add_argument("--num-gpus", type=int, default=0, metavar="G",
+                        help="(Option 2 --long_way only) Pin worker k to GPU k %% G via CUDA_VISIBLE_DEVICES (default: 0 = don't set)")
     parser.add_argument("--model-dir", type=str, default=None,
                         help="(Option 1 only) Depth model: depth-anything/DA3-BASE for whole sequence at once (relative depth); default Nested (metric)")
     parser.add_argument("--chunk-size", type=int, default=None, metavar="N",
@@ -89,21 +224,11 @@ def main():
         os.makedirs(hand_dir, exist_ok=True)
         json_path = os.path.join(hand_dir, "hand_joints.json")
         overlay_path = os.path.join(hand_dir, "joints_overlay.mp4")
-        video_to_hand = os.path.join(script_dir, "video_to_hand_joints.py")
-        if not os.path.isfile(video_to_hand):
-            print(f"Error: video_to_hand_joints.py not found at {video_to_hand}", file=sys.stderr)
-            sys.exit(1)
-        result = subprocess.run(
-            [
-                sys.executable,
-                video_to_hand,
-                video_path,
-                "--output", json_path,
-                "--output-video", overlay_path,
-            ],
-            cwd=script_dir,
-        )
-        sys.exit(result.returncode)
+        require_scripts(script_dir, ("video_to_hand_joints.py",))
+        sys.exit(run_script_main(
+            "video_to_hand_joints",
+            [video_path, "--output", json_path, "--output-video", overlay_path],
+        ))
 
     if args.option == 4:
         if not args.path:
@@ -133,7 +258,8 @@ def main():
             print("Error: depth-pro-run not found on PATH. Activate the depth-pro env or install ml-depth-pro.", file=sys.stderr)
             sys.exit(1)
         n_rgb = len([f for f in os.listdir(rgb_folder) if os.path.isfile(os.path.join(rgb_folder, f))])
-        # Run depth-pro; if apple reaches 2*n_rgb files (all frames done), wait 15s then terminate and continue
+        # Run depth-pro; if apple reaches 2*n_rgb files (all frames done), give it up to 15s to exit, then terminate
+        # and continue. Waits block on the child (not fixed sleeps), so an exit is noticed immediately.
         proc = subprocess.Popen(
             [depth_pro_run, "-i", rgb_folder, "-o", apple_dir],
             cwd=ml_depth_pro_dir,
@@ -146,27 +272,24 @@ def main():
                     sys.exit(ret)
                 break
             if n_rgb > 0 and os.path.isdir(apple_dir):
-                n_apple = len(os.listdir(apple_dir))
-                if n_apple >= target_count:
-                    time.sleep(15)
-                    proc.terminate()
+                if has_at_least_entries(apple_dir, target_count):
                     try:
-                        proc.wait(timeout=10)
+                        proc.wait(timeout=15)
                     except subprocess.TimeoutExpired:
-                        proc.kill()
-                        proc.wait()
+                        proc.terminate()
+                        try:
+                            proc.wait(timeout=10)
+                        except subprocess.TimeoutExpired:
+                            proc.kill()
+                            proc.wait()
                     break
-            time.sleep(5)
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
         # 2) apple_npz_to_depth_png.py <apple_dir> -> creates parent_dir/depth/
-        apple_npz_script = os.path.join(script_dir, "apple_npz_to_depth_png.py")
-        if not os.path.isfile(apple_npz_script):
-            print(f"Error: apple_npz_to_depth_png.py not found at {apple_npz_script}", file=sys.stderr)
-            sys.exit(1)
-        result = subprocess.run(
-            [sys.executable, apple_npz_script, apple_dir],
-            cwd=script_dir,
-        )
-        sys.exit(result.returncode)
+        require_scripts(script_dir, ("apple_npz_to_depth_png.py",))
+        sys.exit(run_script_main("apple_npz_to_depth_png", [apple_dir]))
 
     if args.option == 2:
         if not args.path:
@@ -218,51 +341,40 @@ def main():
                 "--debug", "2",
             ]
             num_batches = (len(color_files) + batch_size - 1) // batch_size
+            # Batches are independent; deal them round-robin onto --workers lanes, each with its own scratch scene.
+            workers = max(1, args.workers)
+            lanes = [[] for _ in range(workers)]
             for batch_idx in range(num_batches):
                 start = batch_idx * batch_size
-                batch_frames = color_files[start:start + batch_size]
-                n_batch = len(batch_frames)
-                if n_batch == 0:
-                    continue
-                tmp = tempfile.mkdtemp(prefix="fp_long_way_")
-                try:
-                    for sub in ("rgb", "depth", "masks"):
-                        os.makedirs(os.path.join(tmp, sub), exist_ok=True)
-                    shutil.copy(cam_K_path, os.path.join(tmp, "cam_K.txt"))
-                    for j, src_rgb in enumerate(batch_frames):
-                        local_name = f"{j:06d}.png"
-                        base = os.path.basename(src_rgb)
-                        shutil.copy2(src_rgb, os.path.join(tmp, "rgb", local_name))
-                        src_depth = os.path.join(depth_dir, base)
-                        if os.path.isfile(src_depth):
-                            shutil.copy2(src_depth, os.path.join(tmp, "depth", local_name))
-                        src_mask = os.path.join(masks_dir, base)
-                        if os.path.isfile(src_mask):
-                            shutil.copy2(src_mask, os.path.join(tmp, "masks", local_name))
-                    tmp_debug = os.path.join(tmp, "output")
-                    result = subprocess.run(
-                        demo_args + ["--test_scene_dir", tmp, "--debug_dir", tmp_debug],
-                        cwd=fp_cwd,
-                    )
-                    if result.returncode != 0:
-                        print(f"Error: run_demo failed on frames {start}–{start + n_batch - 1}", file=sys.stderr)
-                        shutil.rmtree(tmp, ignore_errors=True)
-                        sys.exit(result.returncode)
-                    ob_dir = os.path.join(tmp_debug, "ob_in_cam")
-                    track_vis_src = os.path.join(tmp_debug, "track_vis")
-                    track_vis_dst = os.path.join(debug_dir, "track_vis")
-                    for j in range(n_batch):
-                        src_pose = os.path.join(ob_dir, f"{j:06d}.txt")
-                        if os.path.isfile(src_pose):
-                            frame_base = os.path.basename(batch_frames[j]).replace(".png", ".txt")
-                            shutil.copy2(src_pose, os.path.join(debug_dir, "ob_in_cam", frame_base))
-                        vis_src = os.path.join(track_vis_src, f"{j:06d}.png")
-                        if os.path.isfile(vis_src):
-                            shutil.copy2(vis_src, os.path.join(track_vis_dst, os.path.basename(batch_frames[j])))
-                finally:
-                    shutil.rmtree(tmp, ignore_errors=True)
-                if (batch_idx + 1) % 50 == 0 or batch_idx == 0:
-                    print(f"Long-way: finished batch {batch_idx + 1}/{num_batches} (frames {start}–{start + n_batch - 1})")
+                lanes[batch_idx % workers].append((batch_idx, color_files[start:start + batch_size]))
+            lane_kwargs = dict(
+                batch_size=batch_size,
+                num_batches=num_batches,
+                demo_args=demo_args,
+                fp_cwd=fp_cwd,
+                depth_dir=depth_dir,
+                masks_dir=masks_dir,
+                cam_K_path=cam_K_path,
+                debug_dir=debug_dir,
+                # One listing per directory up front instead of two isfile() stats per frame
+                depth_names=frozenset(os.listdir(depth_dir)) if os.path.isdir(depth_dir) else frozenset(),
+                mask_names=frozenset(os.listdir(masks_dir)) if os.path.isdir(masks_dir) else frozenset(),
+            )
+            if workers == 1:
+                rc = run_long_way_lane(lanes[0], **lane_kwargs)
+            else:
+                stop = threading.Event()
+                with ThreadPoolExecutor(max_workers=workers) as ex:
+                    futures = []
+                    for k, lane in enumerate(lanes):
+                        env = None
+                        if args.num_gpus > 0:
+                            env = {**os.environ, "CUDA_VISIBLE_DEVICES": str(k % args.num_gpus)}
+                        futures.append(ex.submit(run_long_way_lane, lane, env=env, stop=stop, **lane_kwargs))
+                    rcs = [f.result() for f in futures]
+                rc = next((r for r in rcs if r != 0), 0)
+            if rc != 0:
+                sys.exit(rc)
             print(f"Long-way: saved poses to {debug_dir}/ob_in_cam/ and track_vis to {debug_dir}/track_vis/")
             sys.exit(0)
         else:
@@ -290,38 +402,26 @@ def main():
         sys.exit(1)
 
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    process_videos = os.path.join(script_dir, "process_videos.py")
-    npz_to_png = os.path.join(script_dir, "npz_to_png.py")
-    calculate_intrinsics = os.path.join(script_dir, "calculate_intrinsics.py")
-    downscale_rgb = os.path.join(script_dir, "downscale_rgb_to_depth.py")
-    if not os.path.isfile(process_videos):
-        print(f"Error: process_videos.py not found at {process_videos}", file=sys.stderr)
-        sys.exit(1)
-    if not os.path.isfile(npz_to_png):
-        print(f"Error: npz_to_png.py not found at {npz_to_png}", file=sys.stderr)
-        sys.exit(1)
-    if not os.path.isfile(calculate_intrinsics):
-        print(f"Error: calculate_intrinsics.py not found at {calculate_intrinsics}", file=sys.stderr)
-        sys.exit(1)
-    if not os.path.isfile(downscale_rgb):
-        print(f"Error: downscale_rgb_to_depth.py not found at {downscale_rgb}", file=sys.stderr)
-        sys.exit(1)
+    require_scripts(
+        script_dir,
+        ("process_videos.py", "npz_to_png.py", "calculate_intrinsics.py", "downscale_rgb_to_depth.py"),
+    )
 
     video_name = os.path.splitext(os.path.basename(video_path))[0]
-    process_cmd = [sys.executable, process_videos, video_path]
+    process_argv = [video_path]
     if args.model_dir is not None:
-        process_cmd.extend(["--model-dir", args.model_dir])
+        process_argv.extend(["--model-dir", args.model_dir])
     if args.chunk_size is not None:
-        process_cmd.extend(["--chunk-size", str(args.chunk_size)])
+        process_argv.extend(["--chunk-size", str(args.chunk_size)])
     if args.process_res is not None:
-        process_cmd.extend(["--process-res", str(args.process_res)])
+        process_argv.extend(["--process-res", str(args.process_res)])
     if args.scale_factor is not None:
-        process_cmd.extend(["--scale-factor", str(args.scale_factor)])
+        process_argv.extend(["--scale-factor", str(args.scale_factor)])
     if args.sample_ratio is not None:
-        process_cmd.extend(["--sample-ratio", str(args.sample_ratio)])
-    result = subprocess.run(process_cmd, cwd=script_dir)
-    if result.returncode != 0:
-        sys.exit(result.returncode)
+        process_argv.extend(["--sample-ratio", str(args.sample_ratio)])
+    rc = run_script_main("process_videos", process_argv)
+    if rc != 0:
+        sys.exit(rc)
 
     npz_path = os.path.join(script_dir, video_name, "depth.npz")
     if not os.path.isfile(npz_path):
@@ -330,26 +430,14 @@ def main():
     scene_dir = os.path.join(script_dir, video_name)
 
     thin_rgb_to_match_depth(scene_dir, npz_path)
-    result = subprocess.run(
-        [sys.executable, npz_to_png, npz_path],
-        cwd=script_dir,
-    )
-    if result.returncode != 0:
-        sys.exit(result.returncode)
-
-    result = subprocess.run(
-        [sys.executable, calculate_intrinsics, npz_path],
-        cwd=script_dir,
-    )
-    if result.returncode != 0:
-        sys.exit(result.returncode)
-
-    result = subprocess.run(
-        [sys.executable, downscale_rgb, npz_path],
-        cwd=script_dir,
-    )
-    if result.returncode != 0:
-        sys.exit(result.returncode)
+    # Independent once rgb/ is thinned: each only reads depth.npz and writes its own output
+    # (depth/, cam_K.txt, rgb/ in place), so run them concurrently (cv2/numpy/zlib release the GIL).
+    steps = ("npz_to_png", "calculate_intrinsics", "downscale_rgb_to_depth")
+    with ThreadPoolExecutor(max_workers=len(steps)) as ex:
+        rcs = list(ex.map(lambda module_name: run_script_main(module_name, [npz_path]), steps))
+    rc = next((r for r in rcs if r != 0), 0)
+    if rc != 0:
+        sys.exit(rc)
 
     if getattr(args, "no_depth", False):
         # Run full pipeline for real intrinsics, then remove depth outputs.
@@ -3,7 +3,7 @@
 Compute center of mass (x, y) of white pixels for each binary mask in a folder.
 Outputs a JSON file with centroid pixel coordinates per frame.
 
-Requires: pip install Pillow (or use the Depth-Anything-3 conda env which has it).
+Requires: pip install opencv-python (or use the Depth-Anything-3 conda env which has it).
 
 Example (Depth-Anything-3 conda env):
   conda activate Depth-Anything-3
@@ -14,30 +14,107 @@ Example (from parametric_data dir):
 """
 
 import argparse
+import hashlib
 import json
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import cv2
 import numpy as np
-from PIL import Image
+
+# Masks read and decoded per batch (bounds memory to BATCH_SIZE frames).
+BATCH_SIZE = 64
+
+# numba centroid kernel, built on first use; False = numba not installed.
+_CENTROID_U8 = None
+
+
+def _centroid_kernel():
+    """Return the numba kernel for 2D uint8 masks, or None without numba.
+    numba is imported here rather than at module level because the import alone takes a few hundred ms."""
+    global _CENTROID_U8
+    if _CENTROID_U8 is None:
+        try:
+            import numba
+        except ImportError:
+            _CENTROID_U8 = False
+            return None
+
+        @numba.njit(parallel=True, cache=True)
+        def centroid_u8(a):
+            """Fused single pass over a 2D uint8 mask: (sum_x, sum_y, count) of nonzero pixels, rows in parallel."""
+            h, w = a.shape
+            sx = 0
+            sy = 0
+            cnt = 0
+            for y in numba.prange(h):
+                for x in range(w):
+                    if a[y, x] > 0:
+                        sx += x
+                        sy += y
+                        cnt += 1
+            return sx, sy, cnt
+
+        _CENTROID_U8 = centroid_u8
+    return _CENTROID_U8 or None
 
 
 def centroid_of_mask(arr: np.ndarray) -> tuple[float | None, float | None]:
     """
     Compute centroid (x, y) of white pixels in a binary mask (vectorized).
     Returns (cx, cy) in pixel coordinates, or (None, None) if no white pixels.
+    Uses row/column marginal sums (first moments), so no per-pixel index arrays are built;
+    with numba installed, 2D uint8 masks go through a fused parallel kernel instead.
     """
-    ys, xs = np.where(arr > 0)
-    if xs.size == 0:
+    kernel = _centroid_kernel() if arr.ndim == 2 and arr.dtype == np.uint8 else None
+    if kernel is not None:
+        sx, sy, n = kernel(arr)
+        if n == 0:
+            return (None, None)
+        return (float(sx / n), float(sy / n))
+    m = arr > 0
+    col = m.sum(axis=0, dtype=np.int64)
+    n = int(col.sum())
+    if n == 0:
         return (None, None)
-    return (float(np.mean(xs)), float(np.mean(ys)))
+    row = m.sum(axis=1, dtype=np.int64)
+    cx = float((col @ np.arange(col.size, dtype=np.int64)) / n)
+    cy = float((row @ np.arange(row.size, dtype=np.int64)) / n)
+    return (cx, cy)
 
 
-def _process_one(path: Path) -> tuple[str, float | None, float | None]:
-    """Load one mask and return (filename, cx, cy)."""
-    arr = np.array(Image.open(path).convert("L"))
-    cx, cy = centroid_of_mask(arr)
-    return (path.name, cx, cy)
+def centroids_of_masks(stack: np.ndarray) -> list[tuple[float | None, float | None]]:
+    """
+    Batched centroid_of_mask for an (N, H, W) stack of same-sized masks: per-frame
+    marginal sums over the whole stack at once instead of N separate reductions.
+    """
+    m = stack > 0
+    col = m.sum(axis=1, dtype=np.int64)  # (N, W)
+    row = m.sum(axis=2, dtype=np.int64)  # (N, H)
+    n = col.sum(axis=1)
+    denom = np.maximum(n, 1)
+    cx = (col @ np.arange(col.shape[1], dtype=np.int64)) / denom
+    cy = (row @ np.arange(row.shape[1], dtype=np.int64)) / denom
+    return [(float(x), float(y)) if k else (None, None) for x, y, k in zip(cx, cy, n)]
+
+
+def _read_mask(path: Path) -> tuple[bytes, bytes]:
+    """Read one mask file; returns (content digest, encoded bytes)."""
+    data = path.read_bytes()
+    return hashlib.blake2b(data, digest_size=16).digest(), data
+
+
+def _decode_mask(path: Path, data: bytes) -> np.ndarray:
+    """Decode an encoded mask to a contiguous 2D uint8 array, 1 where the mask is nonzero (GIL released in cv2).
+    Decoded unchanged, so 16-bit label masks with small values are not shifted down to zero by an 8-bit
+    conversion; a colour pixel counts if any colour channel is nonzero (alpha is ignored)."""
+    arr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if arr is None:
+        raise OSError(f"Could not read mask: {path}")
+    if arr.ndim == 3:
+        return (arr[:, :, :3] > 0).any(axis=2).view(np.uint8)
+    return (arr > 0).view(np.uint8)
 
 
 def main():
@@ -69,7 +146,7 @@ def main():
         "--jobs",
         type=int,
         default=0,
-        help="Parallel jobs (default: 0 = single process). Use e.g. 8 for 8 workers.",
+        help="Parallel read/decode threads (default: 0 = min(8, CPU count)). Use e.g. 8 for 8 workers.",
     )
     args = parser.parse_args()
 
@@ -87,15 +164,32 @@ def main():
         raise SystemExit(f"No files matching *{args.ext} in {mask_folder}")
 
     results = {}
-    if args.jobs <= 0:
-        for path in paths:
-            arr = np.array(Image.open(path).convert("L"))
-            cx, cy = centroid_of_mask(arr)
-            results[path.name] = {"x": cx, "y": cy}
-    else:
-        with ProcessPoolExecutor(max_workers=args.jobs) as ex:
-            for name, cx, cy in ex.map(_process_one, paths):
-                results[name] = {"x": cx, "y": cy}
+    # Centroid per file content: byte-identical masks (typically the all-black frames where the object
+    # is absent) are decoded once, every later copy costs only a file read and a hash.
+    known = {}
+    workers = args.jobs if args.jobs > 0 else min(8, os.cpu_count() or 1)
+    # Threads, not processes: reading, hashing and decoding release the GIL, and there is nothing to pickle.
+    # Centroids stay on this thread (numba's default parallel backend must not be entered concurrently).
+    with ThreadPoolExecutor(max_workers=workers) as loader:
+        for start in range(0, len(paths), BATCH_SIZE):
+            batch = paths[start:start + BATCH_SIZE]
+            blobs = list(loader.map(_read_mask, batch))
+            todo = {}
+            for path, (digest, data) in zip(batch, blobs):
+                if digest not in known and digest not in todo:
+                    todo[digest] = (path, data)
+            if todo:
+                arrs = list(loader.map(lambda item: _decode_mask(*item), todo.values()))
+                # numba's fused kernel per mask (no stacked copy or boolean temporaries); without numba,
+                # one vectorized reduction per batch when all new masks share a size
+                if _centroid_kernel() is None and all(a.shape == arrs[0].shape for a in arrs):
+                    centroids = centroids_of_masks(np.stack(arrs))
+                else:
+                    centroids = [centroid_of_mask(a) for a in arrs]
+                known.update(zip(todo, centroids))
+            for path, (digest, _) in zip(batch, blobs):
+                cx, cy = known[digest]
+                results[path.name] = {"x": cx, "y": cy}
 
     with open(output_path, "w") as f:
         json.dump(results, f, indent=2)
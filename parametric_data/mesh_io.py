@@ -0,0 +1,59 @@
+"""
+Cheap checks on mesh files, shared by export_single_mesh_obj and the reorient scripts.
+
+trimesh keeps vertex normals read from a file but has no public flag saying so, and an
+exporter that drops them (or trimesh recomputing them) changes what FoundationPose sees.
+has_vertex_normals answers that from the file itself, reading only as far as needed.
+"""
+
+import json
+import os
+import struct
+
+
+def _obj_has_normals(path):
+    # vn lines come before the faces that use them, so stop at the first face
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"vn"):
+                return True
+            if line.startswith(b"f "):
+                return False
+    return False
+
+
+def _ply_has_normals(path):
+    with open(path, "rb") as f:
+        for line in f:
+            parts = line.split()
+            if parts[:1] == [b"end_header"]:
+                return False
+            if parts[:1] == [b"property"] and parts[-1:] == [b"nx"]:
+                return True
+    return False
+
+
+def _gltf_has_normals(path):
+    with open(path, "rb") as f:
+        if path.lower().endswith(".glb"):
+            # 12-byte GLB header, then the JSON chunk: (length, type) + payload
+            f.seek(12)
+            length, _ = struct.unpack("<II", f.read(8))
+            doc = json.loads(f.read(length))
+        else:
+            doc = json.load(f)
+    return any("NORMAL" in p.get("attributes", {}) for m in doc.get("meshes", []) for p in m.get("primitives", []))
+
+
+_CHECKS = {".obj": _obj_has_normals, ".ply": _ply_has_normals, ".glb": _gltf_has_normals, ".gltf": _gltf_has_normals}
+
+
+def has_vertex_normals(mesh_path):
+    """True if the mesh file stores vertex normals (OBJ vn, PLY nx, glTF NORMAL); False for other formats."""
+    check = _CHECKS.get(os.path.splitext(mesh_path)[1].lower())
+    if check is None:
+        return False
+    try:
+        return check(mesh_path)
+    except (OSError, ValueError, struct.error):
+        return False
@@ -0,0 +1,57 @@
+"""
+Read arrays from a depth.npz without decompressing the whole thing into RAM.
+
+np.load() on an .npz (compressed or not) cannot memory-map, and indexing data["depth"]
+inflates the full (N, H, W) stack. These helpers read the member's .npy header for the
+shape alone, or stream it frame by frame along axis 0 with O(H*W) peak memory.
+"""
+
+import zipfile
+
+import numpy as np
+
+
+def _read_header(f):
+    """Return (shape, fortran_order, dtype) from an open .npy stream, or None for unsupported versions."""
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(f)
+    if version == (2, 0):
+        return np.lib.format.read_array_header_2_0(f)
+    return None
+
+
+def npz_array_shape(npz_path: str, key: str) -> tuple | None:
+    """Shape of array `key` in npz_path, read from its header only; None if the key is missing."""
+    with zipfile.ZipFile(npz_path) as zf:
+        member = f"{key}.npy"
+        if member not in zf.namelist():
+            return None
+        with zf.open(member) as f:
+            header = _read_header(f)
+    if header is None:
+        with np.load(npz_path) as data:
+            return data[key].shape
+    return header[0]
+
+
+def iter_npz_frames(npz_path: str, key: str):
+    """Yield array `key` of npz_path one slice at a time along axis 0 (read-only arrays).
+    Falls back to loading the whole array for layouts that can't be streamed (Fortran order, object dtype)."""
+    with zipfile.ZipFile(npz_path) as zf:
+        with zf.open(f"{key}.npy") as f:
+            header = _read_header(f)
+            if header is not None:
+                shape, fortran_order, dtype = header
+                if not fortran_order and not dtype.hasobject and len(shape) >= 1:
+                    frame_shape = shape[1:]
+                    frame_bytes = int(np.prod(frame_shape, dtype=np.int64)) * dtype.itemsize
+                    for _ in range(shape[0]):
+                        buf = f.read(frame_bytes)
+                        if len(buf) != frame_bytes:
+                            raise ValueError(f"{npz_path}: '{key}' is truncated")
+                        yield np.frombuffer(buf, dtype=dtype).reshape(frame_shape)
+                    return
+    with np.load(npz_path) as data:
+        arr = data[key]
+    yield from arr
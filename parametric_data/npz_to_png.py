@@ -10,16 +10,50 @@ Usage:
 
 Output:
     <output_dir>/000000.png, 000001.png, ... (16-bit depth in mm, same naming as rgb/)
+    --format raw: 000000.raw, ... (headerless little-endian uint16, H*W each)
+    --format npy: <output_dir>/depth_u16.npy (one (N, H, W) uint16 array)
+    Only png is read by FoundationPose; raw/npy skip encoding for consumers that take raw depth.
 """
 
 import argparse
+import collections
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+from npz_io import iter_npz_frames, npz_array_shape
+
+
+def depth_m_to_mm(depth_m: np.ndarray, invalid_value: float) -> np.ndarray:
+    """One (H, W) depth frame in meters -> uint16 millimeters, invalid (non-finite or < invalid_value) = 0.
+    With numexpr the mask/scale/clip is one fused, blocked pass; otherwise a single float32 copy is worked in place."""
+    if numexpr is not None:
+        # d - d != 0 is true exactly for NaN and +/-inf
+        depth = numexpr.evaluate(
+            "where((d - d != 0) | (d < thr), 0, where(d * 1000 > 65535, 65535, where(d < 0, 0, d * 1000)))",
+            local_dict={"d": depth_m, "thr": np.float32(invalid_value)},
+        )
+        return depth.astype(np.uint16)
+    depth = np.array(depth_m, dtype=np.float32)
+    invalid = ~np.isfinite(depth)
+    invalid |= depth < invalid_value
+    depth[invalid] = 0
+    np.multiply(depth, 1000.0, out=depth)
+    # Clip to uint16 range; 0 = invalid
+    np.clip(depth, 0, 65535, out=depth)
+    depth_mm = np.empty(depth.shape, dtype=np.uint16)
+    np.copyto(depth_mm, depth, casting="unsafe")
+    return depth_mm
+
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Convert depth.npz to per-frame PNGs for FoundationPose (depth in mm, 16-bit)."
     )
@@ -40,35 +74,45 @@ def main():
         default=0.0,
         help="Depth values below this (meters) are written as 0 in the PNG (default: 0)",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--png-compression",
+        type=int,
+        default=1,
+        choices=range(10),
+        metavar="0-9",
+        help="zlib level for the PNGs (default: 1; lossless at any level, higher = smaller but slower)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("png", "raw", "npy"),
+        default="png",
+        help="Output format: png (FoundationPose), raw per-frame uint16, or one npy stack (default: png)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(32, os.cpu_count() or 8),
+        help="Threads encoding PNGs in parallel (cv2 releases the GIL while encoding; default: CPU count, max 32)",
+    )
+    args = parser.parse_args(argv)
 
     npz_path = os.path.abspath(args.npz_path)
     if not os.path.isfile(npz_path):
         print(f"Error: File not found: {npz_path}", file=sys.stderr)
         sys.exit(1)
 
-    data = np.load(npz_path)
-    if "depth" not in data:
+    # Only the header is read here; frames are streamed from the zip below, so peak memory is O(H*W), not O(N*H*W).
+    shape = npz_array_shape(npz_path, "depth")
+    if shape is None:
         print("Error: npz must contain 'depth' array.", file=sys.stderr)
         sys.exit(1)
-    depth_m = data["depth"]  # (N, H, W), meters
-    data.close()
-
-    n_frames, h, w = depth_m.shape
+    n_frames, h, w = shape  # (N, H, W), meters
 
     if args.output_dir is None:
         args.output_dir = os.path.join(os.path.dirname(npz_path), "depth")
     out_dir = os.path.abspath(args.output_dir)
     os.makedirs(out_dir, exist_ok=True)
 
-    # FoundationPose: depth in millimeters, 16-bit PNG; invalid = 0
-    depth_m = np.asarray(depth_m, dtype=np.float64)
-    invalid = (depth_m < args.invalid_value) | (~np.isfinite(depth_m))
-    depth_m[invalid] = 0
-    depth_mm = (depth_m * 1000.0).astype(np.float64)
-    # Clip to uint16 range; 0 = invalid
-    depth_mm = np.clip(depth_mm, 0, 65535).astype(np.uint16)
-
     try:
         import cv2
     except ImportError:
@@ -77,16 +121,58 @@ def main():
 
     pad_width = len(str(n_frames - 1)) if n_frames > 1 else 1
     pad_width = max(6, pad_width)  # at least 000000, 000001, ...
+    paths = [os.path.join(out_dir, f"{i:0{pad_width}d}.{args.format}") for i in range(n_frames)]
+    stack = None
+    if args.format == "npy":
+        # Written frame by frame through a memmap, so the full stack is never held in memory
+        stack = np.lib.format.open_memmap(
+            os.path.join(out_dir, "depth_u16.npy"), mode="w+", dtype=np.uint16, shape=(n_frames, h, w)
+        )
+
+    # Low zlib level + RLE strategy: deflate dominates encode time, and depth has long runs (e.g. invalid = 0).
+    png_params = [
+        cv2.IMWRITE_PNG_COMPRESSION, args.png_compression,
+        cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE,
+    ]
+
+    def write_frame(i, depth_m):
+        # FoundationPose: depth in millimeters, 16-bit PNG; invalid = 0
+        depth_mm = depth_m_to_mm(depth_m, args.invalid_value)
+        if stack is not None:
+            stack[i] = depth_mm
+            return
+        if args.format == "raw":
+            depth_mm.astype("<u2", copy=False).tofile(paths[i])
+            return
+        ok, buf = cv2.imencode(".png", depth_mm, png_params)
+        if not ok:
+            raise RuntimeError(f"PNG encode failed for frame {i}")
+        with open(paths[i], "wb") as f:
+            f.write(buf)
 
     try:
         from tqdm import tqdm
-        frame_iter = tqdm(range(n_frames), desc="Frames", unit="frame")
+        progress = tqdm(total=n_frames, desc="Frames", unit="frame")
     except ImportError:
-        frame_iter = range(n_frames)
-    for i in frame_iter:
-        name = str(i).zfill(pad_width) + ".png"
-        path = os.path.join(out_dir, name)
-        cv2.imwrite(path, depth_mm[i])
+        progress = None
+    workers = max(1, args.workers)
+    # Bound frames in flight so decompressed depth never piles up ahead of the encoders.
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for i, depth_m in enumerate(iter_npz_frames(npz_path, "depth")):
+            pending.append(ex.submit(write_frame, i, depth_m))
+            while len(pending) >= 2 * workers or (pending and pending[0].done()):
+                pending.popleft().result()
+                if progress is not None:
+                    progress.update()
+        while pending:
+            pending.popleft().result()
+            if progress is not None:
+                progress.update()
+    if progress is not None:
+        progress.close()
+    if stack is not None:
+        stack.flush()
     print(f"Wrote {n_frames} depth frames to {out_dir}")
 
 
@@ -13,45 +13,200 @@ Metric depth (meters): use default Nested model or DA3NESTED-GIANT-LARGE-1.1; if
 """
 
 import argparse
+import collections
+import io
 import os
+import queue
 import subprocess
 import sys
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
+from cv_threads import opencv_threads
 
-def extract_frames_no_depth(video_path: str, output_dir: str, sample_ratio: float):
-    """Extract frames: sample_ratio 1.0 = every frame, 0.5 = every other frame. Save to output_dir/rgb/. Create depth.npz with intrinsics only (no depth)."""
+# Frames buffered between the decode, sampling and encode stages (bounds RAM to a few frames).
+FRAME_PREFETCH = 8
+# Image encode is the heavy stage and OpenCV / libjpeg-turbo release the GIL inside it.
+FRAME_WRITERS = 2
+JPEG_QUALITY = 95
+
+
+def _frame_reader(cap, frame_interval: int, read_q: queue.Queue, errors: list):
+    """Decode every frame_interval-th frame of cap into read_q as (frame_index, frame); None when done."""
+    frame_count = 0
+    try:
+        while True:
+            if frame_count % frame_interval == 0:
+                ret, frame = cap.read()
+            else:
+                # grab() advances without retrieve()'s colour conversion and copy
+                ret, frame = cap.grab(), None
+            if not ret:
+                break
+            if frame is not None:
+                read_q.put((frame_count, frame))
+            frame_count += 1
+    except Exception as e:
+        errors.append(f"decode failed at frame {frame_count}: {e}")
+    finally:
+        read_q.put(None)
+
+
+def _frame_writer(write_q: queue.Queue, write, errors: list):
+    """Write (path, frame) items from write_q with write(path, frame) -> bool until None.
+    After a failure it keeps draining (without writing) so the producer never blocks."""
+    while True:
+        item = write_q.get()
+        if item is None:
+            return
+        if errors:
+            continue
+        path, frame = item
+        try:
+            ok = write(path, frame)
+        except Exception as e:
+            errors.append(f"could not write {path}: {e}")
+            continue
+        if not ok:
+            errors.append(f"could not write {path}")
+
+
+def _image_encoder(image_format: str):
+    """Return encode(frame) -> bytes for BGR frames: PNG via cv2, JPEG via TurboJPEG if installed, else cv2."""
+    import cv2
+    if image_format == "jpg":
+        try:
+            from turbojpeg import TurboJPEG
+            tj = TurboJPEG()
+            return lambda frame: tj.encode(frame, quality=JPEG_QUALITY)
+        except (ImportError, OSError, RuntimeError):
+            pass
+    ext = f".{image_format}"
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if image_format == "jpg" else []
+
+    def encode(frame):
+        ok, buf = cv2.imencode(ext, frame, params)
+        if not ok:
+            raise RuntimeError(f"{image_format} encode failed")
+        return buf.tobytes()
+
+    return encode
+
+
+def _image_writer(image_format: str):
+    """Return write(path, frame) -> bool for BGR frames, one file per frame."""
+    encode = _image_encoder(image_format)
+
+    def write(path, frame):
+        data = encode(frame)
+        with open(path, "wb") as f:
+            f.write(data)
+        return True
+
+    return write
+
+
+def _tar_append(tar, name: str, encoded, mtime: int, errors: list):
+    """Append the bytes of the encoded future to tar as member name (skipped after an earlier failure)."""
+    if errors:
+        return
+    try:
+        data = encoded.result()
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = mtime
+        tar.addfile(info, io.BytesIO(data))
+    except Exception as e:
+        errors.append(f"could not write {name}: {e}")
+
+
+def extract_frames_no_depth(
+    video_path: str, output_dir: str, sample_ratio: float, image_format: str = "png", pack: str = "dir"
+):
+    """Extract frames: sample_ratio 1.0 = every frame, 0.5 = every other frame. Save to output_dir/rgb/ as
+    image_format (png or jpg), or with pack="tar" as rgb/NNNNNN.<ext> members of output_dir/rgb.tar.
+    Create depth.npz with intrinsics only (no depth)."""
     try:
         import cv2
     except ImportError:
         print("Error: --no-depth requires opencv-python (cv2). pip install opencv-python", file=sys.stderr)
         sys.exit(1)
+    cv2.setNumThreads(opencv_threads())
     rgb_dir = os.path.join(output_dir, "rgb")
-    os.makedirs(rgb_dir, exist_ok=True)
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"Error: Cannot open video: {video_path}", file=sys.stderr)
         sys.exit(1)
+    tar = None
+    if pack == "tar":
+        # One sequential archive instead of a file (and inode) per frame
+        os.makedirs(output_dir, exist_ok=True)
+        frames_dest = rgb_dir + ".tar"
+        tar = tarfile.open(frames_dest, "w")
+    else:
+        os.makedirs(rgb_dir, exist_ok=True)
+        frames_dest = rgb_dir
     ratio = max(1e-6, min(1.0, float(sample_ratio)))
     frame_interval = max(1, int(round(1.0 / ratio)))
     frame_paths = []
-    frame_count = 0
-    saved_count = 0
     h, w = None, None
+    # reader thread (decode) -> this thread (naming) -> writer threads (encode), with bounded queues
+    # so decode and encode overlap while back-pressure keeps only a few frames in memory.
+    # For tar the writers only encode; this thread appends the members in frame order.
+    errors = []
+    read_q = queue.Queue(maxsize=FRAME_PREFETCH)
+    reader = threading.Thread(target=_frame_reader, args=(cap, frame_interval, read_q, errors), daemon=True)
+    writers = []
+    if tar is None:
+        write_q = queue.Queue(maxsize=FRAME_PREFETCH)
+        writers = [
+            threading.Thread(target=_frame_writer, args=(write_q, _image_writer(image_format), errors), daemon=True)
+            for _ in range(FRAME_WRITERS)
+        ]
+    else:
+        encode = _image_encoder(image_format)
+        encoders = ThreadPoolExecutor(max_workers=FRAME_WRITERS)
+        pending = collections.deque()
+        mtime = int(time.time())
+    reader.start()
+    for t in writers:
+        t.start()
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        item = read_q.get()
+        if item is None:
             break
-        if frame_count % frame_interval == 0:
-            if h is None:
-                h, w = frame.shape[:2]
-            path = os.path.join(rgb_dir, f"{saved_count:06d}.png")
-            cv2.imwrite(path, frame)
-            frame_paths.append(path)
-            saved_count += 1
-        frame_count += 1
+        _, frame = item
+        if h is None:
+            h, w = frame.shape[:2]
+        name = f"{len(frame_paths):06d}.{image_format}"
+        # Tar members are named rgb/NNNNNN.<ext>, so extracting in output_dir recreates rgb/
+        path = f"rgb/{name}" if tar is not None else os.path.join(rgb_dir, name)
+        frame_paths.append(path)
+        if tar is None:
+            write_q.put((path, frame))
+        elif not errors:
+            # Appending from the head of the deque keeps members in frame order; the bound caps frames in flight
+            pending.append((path, encoders.submit(encode, frame)))
+            while len(pending) >= FRAME_PREFETCH or (pending and pending[0][1].done()):
+                _tar_append(tar, *pending.popleft(), mtime, errors)
+    for _ in writers:
+        write_q.put(None)
+    reader.join()
+    for t in writers:
+        t.join()
     cap.release()
+    if tar is not None:
+        while pending:
+            _tar_append(tar, *pending.popleft(), mtime, errors)
+        encoders.shutdown()
+        tar.close()
+    if errors:
+        print(f"Error: {errors[0]}", file=sys.stderr)
+        sys.exit(1)
     if not frame_paths:
         print("Error: No frames extracted.", file=sys.stderr)
         sys.exit(1)
@@ -60,13 +215,15 @@ def extract_frames_no_depth(video_path: str, output_dir: str, sample_ratio: floa
     fx = fy = float(max(w, h))
     cx, cy = w / 2.0, h / 2.0
     K = np.array([[fx, 0, cx], [0, fy, cy], [0, 0, 1]], dtype=np.float64)
-    intrinsics = np.tile(K[np.newaxis, ...], (n, 1, 1))
+    # Zero-copy (n, 3, 3) view; np.savez streams it into the zip without a tiled copy
+    intrinsics = np.broadcast_to(K, (n, 3, 3))
     npz_path = os.path.join(output_dir, "depth.npz")
-    np.savez_compressed(npz_path, intrinsics=intrinsics)
-    print(f"Extracted {n} frames to {rgb_dir}; wrote {npz_path} (intrinsics only, no depth).")
+    # Uncompressed: n identical 3x3 matrices are tiny, and deflate only costs time on write and load
+    np.savez(npz_path, intrinsics=intrinsics)
+    print(f"Extracted {n} frames to {frames_dest}; wrote {npz_path} (intrinsics only, no depth).")
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Process a video with Depth-Anything-3 and save depth outputs in parametric_data."
     )
@@ -120,7 +277,21 @@ def main():
         action="store_true",
         help="Only extract RGB frames and write cam_K-ready intrinsics (no depth model). Use with main.py --no-depth.",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--image-format",
+        choices=("png", "jpg"),
+        default="png",
+        help="Frame format for --no-depth (default: png). jpg (quality 95, TurboJPEG if installed) encodes much "
+        "faster but is lossy, and main.py / FoundationPose only pick up rgb/*.png.",
+    )
+    parser.add_argument(
+        "--pack",
+        choices=("dir", "tar"),
+        default="dir",
+        help="Where --no-depth frames go: dir = one file each in rgb/ (default), tar = members of one rgb.tar "
+        "in frame order (no per-file create). main.py / FoundationPose need dir.",
+    )
+    args = parser.parse_args(argv)
 
     video_path = os.path.abspath(args.video_path)
     if not os.path.isfile(video_path):
@@ -133,7 +304,7 @@ def main():
     output_dir = os.path.join(output_base, video_name)
 
     if args.no_depth:
-        extract_frames_no_depth(video_path, output_dir, args.sample_ratio)
+        extract_frames_no_depth(video_path, output_dir, args.sample_ratio, args.image_format, args.pack)
         print(f"Done. Results in {output_dir}")
         return
 
@@ -18,20 +18,40 @@ import sys
 
 import numpy as np
 
-
-def rotation_matrix_x(deg):
-    c, s = np.cos(np.radians(deg)), np.sin(np.radians(deg))
-    return np.array([[1, 0, 0], [0, c, -s], [0, s, c]], dtype=np.float64)
-
-
-def rotation_matrix_y(deg):
-    c, s = np.cos(np.radians(deg)), np.sin(np.radians(deg))
-    return np.array([[c, 0, s], [0, 1, 0], [-s, 0, c]], dtype=np.float64)
-
-
-def rotation_matrix_z(deg):
-    c, s = np.cos(np.radians(deg)), np.sin(np.radians(deg))
-    return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]], dtype=np.float64)
+from mesh_io import has_vertex_normals
+
+
+def euler_xyz_matrix(deg_x, deg_y, deg_z):
+    """3x3 Rx(deg_x) @ Ry(deg_y) @ Rz(deg_z), written out in closed form."""
+    cx, sx = np.cos(np.radians(deg_x)), np.sin(np.radians(deg_x))
+    cy, sy = np.cos(np.radians(deg_y)), np.sin(np.radians(deg_y))
+    cz, sz = np.cos(np.radians(deg_z)), np.sin(np.radians(deg_z))
+    return np.array(
+        [
+            [cy * cz, -cy * sz, sy],
+            [cx * sz + sx * sy * cz, cx * cz - sx * sy * sz, -sx * cy],
+            [sx * sz - cx * sy * cz, sx * cz + cx * sy * sz, cx * cy],
+        ],
+        dtype=np.float64,
+    )
+
+
+def write_obj(path, verts, faces):
+    """Write a plain triangle mesh as OBJ (v lines, then 1-based f lines), formatted by one %-template per block."""
+    verts = np.asarray(verts, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64) + 1
+    with open(path, "w") as f:
+        f.write(("v %.8f %.8f %.8f\n" * len(verts)) % tuple(verts.ravel().tolist()))
+        f.write(("f %d %d %d\n" * len(faces)) % tuple(faces.ravel().tolist()))
+
+
+def export_obj(mesh, out_path, normals=False):
+    """Export mesh as OBJ: plain geometry through write_obj; colours, textures or (with normals=True,
+    see mesh_io.has_vertex_normals) vertex normals through trimesh. Normals are written only when normals is True."""
+    if mesh.visual.kind is None and not normals:
+        write_obj(out_path, mesh.vertices, mesh.faces)
+    else:
+        mesh.export(out_path, include_normals=normals)
 
 
 def main():
@@ -58,10 +78,11 @@ def main():
     if isinstance(loaded, trimesh.Scene):
         mesh = trimesh.util.concatenate(list(loaded.geometry.values()))
     else:
-        mesh = loaded.copy()
+        # No copy: a copy drops the vertex normals trimesh loaded from the file
+        mesh = loaded
 
     R = np.eye(4)
-    R[:3, :3] = rotation_matrix_x(args.rot_x) @ rotation_matrix_y(args.rot_y) @ rotation_matrix_z(args.rot_z)
+    R[:3, :3] = euler_xyz_matrix(args.rot_x, args.rot_y, args.rot_z)
     mesh.apply_transform(R)
 
     if args.output:
@@ -72,7 +93,7 @@ def main():
         out_path = os.path.join(d, f"{stem}_reorient.obj")
 
     os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
-    mesh.export(out_path)
+    export_obj(mesh, out_path, has_vertex_normals(mesh_path))
     print(f"Wrote: {out_path}")
     print("  Tip: If the box was vertical when the scalpel was horizontal, try --rot-y 90 so the blade axis (was Z) becomes X.")
 
@@ -11,29 +11,56 @@ Usage:
 import argparse
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
-import numpy as np
+from mesh_io import has_vertex_normals
+from reorient_mesh import euler_xyz_matrix, export_obj
 
+# Base mesh (and whether its vertex normals were loaded) in each export worker process,
+# sent once via the pool initializer, not per task.
+_BASE_MESH = None
+_NORMALS = False
 
-def rotation_matrix_x(deg):
-    c, s = np.cos(np.radians(deg)), np.sin(np.radians(deg))
-    return np.array([[1, 0, 0], [0, c, -s], [0, s, c]], dtype=np.float64)
 
+def rotated_mesh(base_mesh, R, normals=False):
+    """New Trimesh sharing base_mesh's faces, with vertices (and, with normals=True, its vertex normals)
+    rotated by 3x3 R. Built with process=False, so there is no merge/validation pass and no 4x4 transform."""
+    import trimesh
+    kwargs = {}
+    if normals:
+        kwargs["vertex_normals"] = base_mesh.vertex_normals @ R.T
+    return trimesh.Trimesh(
+        vertices=base_mesh.vertices @ R.T,
+        faces=base_mesh.faces,
+        visual=base_mesh.visual.copy(),
+        process=False,
+        **kwargs,
+    )
 
-def rotation_matrix_y(deg):
-    c, s = np.cos(np.radians(deg)), np.sin(np.radians(deg))
-    return np.array([[c, 0, s], [0, 1, 0], [-s, 0, c]], dtype=np.float64)
 
+def _init_worker(base_mesh, normals):
+    global _BASE_MESH, _NORMALS
+    _BASE_MESH = base_mesh
+    _NORMALS = normals
 
-def rotation_matrix_z(deg):
-    c, s = np.cos(np.radians(deg)), np.sin(np.radians(deg))
-    return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]], dtype=np.float64)
+
+def _rotate_and_export(R, out_path):
+    """Rotate the worker's base mesh by R and export it to out_path."""
+    export_obj(rotated_mesh(_BASE_MESH, R, _NORMALS), out_path, _NORMALS)
+    return out_path
 
 
 def main():
     parser = argparse.ArgumentParser(description="Create 8 reoriented OBJs (0/90 deg on X,Y,Z).")
     parser.add_argument("mesh_path", type=str, help="Input OBJ")
     parser.add_argument("--out-dir", type=str, default=None, help="Output directory (default: same as input)")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=min(8, os.cpu_count() or 1),
+        help="Export processes (OBJ export is GIL-bound Python; default: min(8, CPU count), 1 = in-process)",
+    )
     args = parser.parse_args()
 
     try:
@@ -55,20 +82,27 @@ def main():
     if isinstance(loaded, trimesh.Scene):
         base_mesh = trimesh.util.concatenate(list(loaded.geometry.values()))
     else:
-        base_mesh = loaded.copy()
+        # No copy: a copy drops the vertex normals trimesh loaded from the file
+        base_mesh = loaded
+    normals = has_vertex_normals(mesh_path)
 
+    jobs = []
     for x in (0, 90):
         for y in (0, 90):
             for z in (0, 90):
                 name = f"{stem}_X{x}Y{y}Z{z}.obj"
-                out_path = os.path.join(out_dir, name)
-                R = np.eye(4)
-                R[:3, :3] = (
-                    rotation_matrix_x(x) @ rotation_matrix_y(y) @ rotation_matrix_z(z)
-                )
-                mesh = base_mesh.copy()
-                mesh.apply_transform(R)
-                mesh.export(out_path)
+                jobs.append((euler_xyz_matrix(x, y, z), os.path.join(out_dir, name)))
+
+    if args.jobs <= 1:
+        for R, out_path in jobs:
+            export_obj(rotated_mesh(base_mesh, R, normals), out_path, normals)
+            print(out_path)
+    else:
+        # The 8 exports are independent files, so fan them out over processes.
+        with ProcessPoolExecutor(
+            max_workers=min(args.jobs, len(jobs)), initializer=_init_worker, initargs=(base_mesh, normals)
+        ) as ex:
+            for out_path in ex.map(_rotate_and_export, *zip(*jobs)):
                 print(out_path)
 
     print("Done. 8 files written to", out_dir)
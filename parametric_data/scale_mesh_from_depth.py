@@ -20,16 +20,20 @@ import numpy as np
 
 
 def unproject_depth_mask(depth_m, mask, K):
-    """Return (N,3) points in camera frame (meters) where mask is True and depth valid."""
-    H, W = depth_m.shape
-    fx, fy = K[0, 0], K[1, 1]
-    cx, cy = K[0, 2], K[1, 2]
-    valid = (mask > 0) & (depth_m >= 0.001) & np.isfinite(depth_m)
-    v, u = np.where(valid)
-    z = depth_m[v, u]
-    x = (u - cx) * z / fx
-    y = (v - cy) * z / fy
-    return np.stack([x, y, z], axis=1)
+    """Return (N,3) float32 points in camera frame (meters) where mask is True and depth valid.
+    Only the mask's bounding box is scanned; then one K^-1 @ [u, v, 1] product over the selected pixels, scaled by their depth."""
+    import cv2
+    x0, y0, w, h = cv2.boundingRect(mask.astype(np.uint8, copy=False))
+    mask_c = mask[y0:y0 + h, x0:x0 + w]
+    depth_c = depth_m[y0:y0 + h, x0:x0 + w]
+    valid = np.logical_and.reduce((mask_c > 0, depth_c >= 0.001, np.isfinite(depth_c)))
+    v, u = np.nonzero(valid)
+    z = depth_c[v, u].astype(np.float32, copy=False)
+    u += x0
+    v += y0
+    K_inv = np.linalg.inv(K).astype(np.float32)
+    uv1 = np.stack([u.astype(np.float32), v.astype(np.float32), np.ones(u.size, dtype=np.float32)])
+    return (K_inv @ uv1 * z).T
 
 
 def main():
@@ -78,7 +82,7 @@ def main():
     if depth is None:
         print("Error: Could not read depth image.", file=sys.stderr)
         sys.exit(1)
-    depth_m = depth.astype(np.float64) / 1000.0  # mm -> meters
+    depth_m = depth.astype(np.float32) / 1000.0  # mm -> meters (float32 is ample for mm-quantized depth)
     mask_img = cv2.imread(mask_path, -1)
     if mask_img is None:
         print("Error: Could not read mask image.", file=sys.stderr)
@@ -10,18 +10,31 @@ Usage:
 """
 
 import argparse
+import collections
 import json
 import os
-import shutil
+import queue
 import subprocess
 import sys
-import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+from cv_threads import opencv_threads
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Default hand landmarker model URL (MediaPipe hosted)
 HAND_LANDMARKER_TASK_URL = (
     "https://storage.googleapis.com/mediapipe-models/hand_landmarker/hand_landmarker/float16/1/hand_landmarker.task"
 )
 
+# Decoded frames buffered ahead of the detector / annotated frames queued for the encoder (bounds RAM).
+FRAME_QUEUE_SIZE = 8
+
 # MediaPipe 21 hand landmarks: skeleton edges (pairs of landmark indices)
 HAND_CONNECTIONS = [
     (0, 1), (1, 2), (2, 3), (3, 4),       # thumb
@@ -36,36 +49,176 @@ HAND_CONNECTIONS = [
 def draw_hand_landmarks_cv2(frame_bgr, hand_landmarks, joint_radius=4, line_thickness=2):
     """Draw hand landmarks and connections on a BGR frame. hand_landmarks: list of objects with .x, .y (normalized 0-1)."""
     import cv2
+    import numpy as np
     h, w = frame_bgr.shape[:2]
-    pts = []
-    for lm in hand_landmarks:
-        px = int(lm.x * w)
-        py = int(lm.y * h)
-        pts.append((px, py))
-    for (i, j) in HAND_CONNECTIONS:
-        if i < len(pts) and j < len(pts):
-            cv2.line(frame_bgr, pts[i], pts[j], (0, 255, 0), line_thickness)
-    for (px, py) in pts:
+    # (N, 2) pixel coords in one array op; truncation matches int(lm.x * w)
+    xy = np.array([(lm.x, lm.y) for lm in hand_landmarks], dtype=np.float64).reshape(-1, 2)
+    pts = (xy * (w, h)).astype(np.int32)
+    conns = np.array(HAND_CONNECTIONS, dtype=np.intp)
+    conns = conns[(conns < len(pts)).all(axis=1)]
+    # All skeleton edges as 2-point open polylines in a single call
+    cv2.polylines(frame_bgr, list(pts[conns]), False, (0, 255, 0), line_thickness)
+    for (px, py) in pts.tolist():
         cv2.circle(frame_bgr, (px, py), joint_radius, (0, 0, 255), -1)
 
 
+def hands_from_result(detection_result, max_hands):
+    """JSON hands list (handedness + 21 rounded landmarks each) from a HandLandmarker result."""
+    hands_list = []
+    if detection_result.hand_landmarks:
+        for h, hand_lms in enumerate(detection_result.hand_landmarks):
+            if h >= max_hands:
+                break
+            landmarks = [
+                {"x": round(lm.x, 6), "y": round(lm.y, 6), "z": round(lm.z, 6)}
+                for lm in hand_lms
+            ]
+            handedness = "Unknown"
+            if detection_result.handedness and h < len(detection_result.handedness):
+                cat = detection_result.handedness[h]
+                if cat and len(cat) > 0:
+                    handedness = cat[0].category_name
+            hands_list.append({"handedness": handedness, "landmarks": landmarks})
+    return hands_list
+
+
+def to_mp_image(mp, rgb):
+    """MediaPipe Image from a contiguous RGB uint8 array (ImageFrame on older MediaPipe builds)."""
+    try:
+        return mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
+    except (AttributeError, TypeError):
+        from mediapipe.tasks.python.components.containers import ImageFormat, ImageFrame
+        return ImageFrame(image_format=ImageFormat.SRGB, data=rgb)
+
+
+def _small_gray(frame_bgr):
+    """Downsampled grayscale thumbnail used for cheap frame-difference gating."""
+    import cv2
+    return cv2.resize(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY), (160, 90), interpolation=cv2.INTER_AREA)
+
+
+def _read_frames(cap, video_fps, keep, read_q, stop, errors):
+    """Reader thread: decode cap and push (frame_idx, t_sec, frame_bgr) for frames where keep(frame_idx);
+    frames that are not kept are only grabbed. Pushes None when done or when stop is set."""
+    import cv2
+    frame_idx = -1
+    try:
+        while not stop.is_set():
+            frame_idx += 1
+            if not keep(frame_idx):
+                if not cap.grab():
+                    break
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            t_sec = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 if video_fps else frame_idx / max(1, video_fps)
+            read_q.put((frame_idx, t_sec, frame))
+    except Exception as e:
+        errors.append(e)
+    finally:
+        read_q.put(None)
+
+
+def _write_overlay(overlay, write_q, errors):
+    """Writer thread: feed frames from write_q to overlay until None; after a failure keep draining."""
+    while True:
+        frame = write_q.get()
+        if frame is None:
+            return
+        if errors:
+            continue
+        try:
+            overlay.write(frame)
+        except Exception as e:
+            errors.append(e)
+
+
+class OverlayVideoWriter:
+    """H.264 (yuv420p) encoder fed raw BGR frames: PyAV in-process if installed, else piped into ffmpeg's stdin.
+    Opened lazily on the first frame so the encoder gets the real decoded frame size."""
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps if fps and fps > 0 else 30.0
+        self._av = None
+        self._container = None
+        self._stream = None
+        self._proc = None
+
+    def _open(self, width, height):
+        try:
+            import av
+        except ImportError:
+            av = None
+        if av is not None:
+            self._container = av.open(self.path, "w")
+            self._stream = self._container.add_stream("libx264", rate=Fraction(self.fps).limit_denominator(1001))
+            self._stream.width, self._stream.height = width, height
+            self._stream.pix_fmt = "yuv420p"
+            self._av = av
+            return
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}",
+            "-framerate", str(self.fps),
+            "-i", "-",
+            "-c:v", "libx264",
+            "-pix_fmt", "yuv420p",
+            self.path,
+        ]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, frame_bgr):
+        if self._container is None and self._proc is None:
+            self._open(frame_bgr.shape[1], frame_bgr.shape[0])
+        if self._container is not None:
+            frame = self._av.VideoFrame.from_ndarray(frame_bgr, format="bgr24")
+            self._container.mux(self._stream.encode(frame))
+        else:
+            # Decoded/annotated frames are C-contiguous, so the buffer is written without a copy
+            self._proc.stdin.write(frame_bgr)
+
+    def close(self) -> int:
+        """Flush and finish the file; returns 0 on success, else the encoder's exit code."""
+        if self._container is not None:
+            self._container.mux(self._stream.encode())
+            self._container.close()
+            return 0
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            return self._proc.wait()
+        return 0
+
+
 def get_model_path(script_dir: str) -> str:
     """Return path to hand_landmarker.task, downloading if needed."""
     path = os.path.join(script_dir, "hand_landmarker.task")
     if os.path.isfile(path):
         return path
+    # Download next to the target and rename on success, so an interrupted download never leaves a
+    # truncated .task at path (which would pass the isfile check above and fail in MediaPipe).
+    tmp = f"{path}.{os.getpid()}.tmp"
     try:
         import urllib.request
         print("Downloading hand_landmarker.task (one-time)...", file=sys.stderr)
-        urllib.request.urlretrieve(HAND_LANDMARKER_TASK_URL, path)
+        urllib.request.urlretrieve(HAND_LANDMARKER_TASK_URL, tmp)
+        os.replace(tmp, path)
         return path
     except Exception as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
         print(f"Error: Could not download model: {e}", file=sys.stderr)
         print("Download manually from:", HAND_LANDMARKER_TASK_URL, file=sys.stderr)
         sys.exit(1)
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Extract hand landmarks per frame from video; write JSON.",
     )
@@ -107,7 +260,32 @@ def main():
         metavar="PATH",
         help="Also write a video with joints drawn on the hands",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--gpu",
+        action="store_true",
+        help="Run the landmark model on MediaPipe's GPU delegate (falls back to CPU if unavailable)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Parallel detectors for JSON-only runs (default: 1 = single VIDEO-mode tracker). "
+        "Frames are then detected independently (IMAGE mode, no tracking). Ignored with --output-video.",
+    )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the JSON output (default: compact, about 3x smaller and faster to write)",
+    )
+    parser.add_argument(
+        "--static-threshold",
+        type=float,
+        default=0.0,
+        metavar="T",
+        help="Reuse the last detection when a frame's mean absolute gray-level difference (0-255, on a 160x90 "
+        "thumbnail) from the last detected frame is below T (default: 0 = detect every frame)",
+    )
+    args = parser.parse_args(argv)
 
     video_path = os.path.abspath(args.video_path)
     if not os.path.isfile(video_path):
@@ -116,10 +294,10 @@ def main():
 
     try:
         import cv2
-        import numpy as np
     except ImportError as e:
         print(f"Error: {e}. Install: pip install opencv-python numpy", file=sys.stderr)
         sys.exit(1)
+    cv2.setNumThreads(opencv_threads())
 
     try:
         import mediapipe as mp
@@ -150,106 +328,194 @@ def main():
         frame_interval = max(1, int(video_fps / args.fps))
 
     write_overlay = args.output_video is not None
+    overlay = None
     if write_overlay:
         out_video_path = os.path.abspath(args.output_video)
         os.makedirs(os.path.dirname(out_video_path) or ".", exist_ok=True)
-        frames_dir = tempfile.mkdtemp(prefix="hand_joints_frames_")
+        # Annotated frames go straight into the H.264 encoder (no PNG dump + re-decode)
+        overlay = OverlayVideoWriter(out_video_path, video_fps)
     else:
         out_video_path = None
-        frames_dir = None
-
-    base_options = mp_tasks.BaseOptions(model_asset_path=model_path)
-    options = vision.HandLandmarkerOptions(
-        base_options=base_options,
-        num_hands=args.max_hands,
-        min_hand_detection_confidence=args.min_confidence,
-        min_hand_presence_confidence=0.3,
-        min_tracking_confidence=0.3,
+
+    def make_options(delegate, running_mode):
+        return vision.HandLandmarkerOptions(
+            base_options=mp_tasks.BaseOptions(model_asset_path=model_path, delegate=delegate),
+            running_mode=running_mode,
+            num_hands=args.max_hands,
+            min_hand_detection_confidence=args.min_confidence,
+            min_hand_presence_confidence=0.3,
+            min_tracking_confidence=0.3,
+        )
+
+    def create_detector(running_mode):
+        if args.gpu:
+            try:
+                return vision.HandLandmarker.create_from_options(
+                    make_options(mp_tasks.BaseOptions.Delegate.GPU, running_mode)
+                )
+            except (RuntimeError, ValueError, NotImplementedError) as e:
+                print(f"Warning: GPU delegate unavailable ({e}); using CPU.", file=sys.stderr)
+                args.gpu = False
+        return vision.HandLandmarker.create_from_options(make_options(mp_tasks.BaseOptions.Delegate.CPU, running_mode))
+
+    # Default: one VIDEO-mode detector, which tracks hands from frame to frame and only re-runs the palm
+    # detector when tracking is lost. With --workers N (JSON only; the overlay must stay in order) frames are
+    # independent IMAGE-mode detections spread over N detectors on N threads (TFLite releases the GIL).
+    parallel = args.workers > 1 and overlay is None
+    if parallel:
+        detectors = [create_detector(vision.RunningMode.IMAGE) for _ in range(args.workers)]
+        free_detectors = queue.Queue()
+        for d in detectors:
+            free_detectors.put(d)
+        ex = ThreadPoolExecutor(max_workers=args.workers)
+    else:
+        detectors = [create_detector(vision.RunningMode.VIDEO)]
+        ex = None
+    detector = detectors[0]
+
+    def detect_frame(frame_idx, t_sec, frame):
+        """IMAGE-mode detection of one frame on whichever detector is free."""
+        mp_image = to_mp_image(mp, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        det = free_detectors.get()
+        try:
+            detection_result = det.detect(mp_image)
+        finally:
+            free_detectors.put(det)
+        return {
+            "frame": frame_idx,
+            "time_sec": round(t_sec, 4),
+            "hands": hands_from_result(detection_result, args.max_hands),
+        }
+
+    # reader thread (decode) -> this thread (MediaPipe, drawing) -> writer thread (H.264 encode),
+    # so decoding and encoding overlap with detection; the detector stays on this thread (VIDEO mode is stateful).
+    sample = not write_overlay and args.fps is not None
+    stop = threading.Event()
+    errors = []
+    read_q = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    reader = threading.Thread(
+        target=_read_frames,
+        args=(cap, video_fps, lambda i: not sample or i % frame_interval == 0, read_q, stop, errors),
+        daemon=True,
     )
-    detector = vision.HandLandmarker.create_from_options(options)
+    reader.start()
+    write_q = writer = None
+    if overlay is not None:
+        write_q = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+        writer = threading.Thread(target=_write_overlay, args=(overlay, write_q, errors), daemon=True)
+        writer.start()
     try:
-        num_landmarks = 21
         frames_out = []
-        frame_idx = -1
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
+        pending = collections.deque()
+        last_ts_ms = -1
+        ref_small = None
+
+        def collect(entry):
+            # entry: (frame_idx, t_sec, future), future None = static frame, reuses the previous frame's hands
+            frame_idx, t_sec, fut = entry
+            if fut is not None:
+                frames_out.append(fut.result())
+            else:
+                frames_out.append({"frame": frame_idx, "time_sec": round(t_sec, 4), "hands": frames_out[-1]["hands"]})
+
+        while not errors:
+            item = read_q.get()
+            if item is None:
                 break
-            frame_idx += 1
-            if not write_overlay and args.fps is not None and frame_idx % frame_interval != 0:
+            frame_idx, t_sec, frame = item
+
+            # Frame-difference gate against the last frame that was actually detected (so slow motion accumulates)
+            static = False
+            if args.static_threshold > 0:
+                small = _small_gray(frame)
+                static = ref_small is not None and cv2.absdiff(ref_small, small).mean() < args.static_threshold
+                if not static:
+                    ref_small = small
+
+            if ex is not None:
+                # Results are collected in submission order; bound frames in flight
+                pending.append((frame_idx, t_sec, None if static else ex.submit(detect_frame, frame_idx, t_sec, frame)))
+                while len(pending) >= 2 * args.workers or (
+                    pending and (pending[0][2] is None or pending[0][2].done())
+                ):
+                    collect(pending.popleft())
                 continue
 
-            t_sec = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 if video_fps else frame_idx / max(1, video_fps)
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            rgb_mp = np.ascontiguousarray(rgb).astype(np.uint8)
-
-            # MediaPipe Image from numpy (RGB)
-            try:
-                mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_mp)
-            except (AttributeError, TypeError):
-                from mediapipe.tasks.python.components.containers import ImageFormat, ImageFrame
-                mp_image = ImageFrame(image_format=ImageFormat.SRGB, data=rgb_mp)
-            detection_result = detector.detect(mp_image)
-
-            hands_list = []
-            if detection_result.hand_landmarks:
-                for h, hand_lms in enumerate(detection_result.hand_landmarks):
-                    if h >= args.max_hands:
-                        break
-                    landmarks = [
-                        {"x": round(lm.x, 6), "y": round(lm.y, 6), "z": round(lm.z, 6)}
-                        for lm in hand_lms
-                    ]
-                    handedness = "Unknown"
-                    if detection_result.handedness and h < len(detection_result.handedness):
-                        cat = detection_result.handedness[h]
-                        if cat and len(cat) > 0:
-                            handedness = cat[0].category_name
-                    hands_list.append({"handedness": handedness, "landmarks": landmarks})
-
-            if write_overlay and frames_dir is not None:
-                annot_frame = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+            if not static:
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                # cvtColor already returns a contiguous uint8 array, which is what mp.Image needs
+                mp_image = to_mp_image(mp, rgb)
+                # detect_for_video needs strictly increasing ms timestamps; derive them from the frame index
+                # (CAP_PROP_POS_MSEC is unreliable on some containers)
+                ts_ms = int(frame_idx * 1000.0 / video_fps) if video_fps else int(t_sec * 1000.0)
+                ts_ms = max(ts_ms, last_ts_ms + 1)
+                last_ts_ms = ts_ms
+                detection_result = detector.detect_for_video(mp_image, ts_ms)
+                hands_list = hands_from_result(detection_result, args.max_hands)
+            # else: detection_result / hands_list carry over from the last detected frame
+
+            if overlay is not None:
+                # Draw on the decoded BGR frame itself: MediaPipe already has its own RGB copy, and
+                # cap.read() hands out a fresh array per frame, so nothing else sees the drawing.
+                annot_frame = frame
                 if detection_result.hand_landmarks:
                     for hand_landmarks in detection_result.hand_landmarks:
                         draw_hand_landmarks_cv2(annot_frame, hand_landmarks, joint_radius=4, line_thickness=2)
-                frame_path = os.path.join(frames_dir, f"frame_{frame_idx:06d}.png")
-                cv2.imwrite(frame_path, annot_frame)
+                write_q.put(annot_frame)
 
             frames_out.append({
                 "frame": frame_idx,
                 "time_sec": round(t_sec, 4),
                 "hands": hands_list,
             })
-
+        while pending:
+            collect(pending.popleft())
+
+        if writer is not None:
+            write_q.put(None)
+            writer.join()
+            writer = None
+        if errors:
+            raise errors[0]
+
+    except (FileNotFoundError, BrokenPipeError) as e:
+        # ffmpeg missing from PATH, or it exited while frames were still being piped in
+        print(f"Error: ffmpeg failed to create overlay video: {e}", file=sys.stderr)
+        sys.exit(1)
     finally:
-        detector.close()
-    cap.release()
+        # Unblock and join the threads before releasing what they use
+        stop.set()
+        while reader.is_alive():
+            try:
+                read_q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if writer is not None:
+            write_q.put(None)
+            writer.join()
+        if ex is not None:
+            ex.shutdown(wait=True, cancel_futures=True)
+        for d in detectors:
+            d.close()
+        cap.release()
+        overlay_rc = overlay.close() if overlay is not None else 0
+
+    if overlay_rc != 0:
+        print("Error: ffmpeg failed to create overlay video.", file=sys.stderr)
+        sys.exit(overlay_rc)
 
     if not frames_out:
         print("Error: No frames read.", file=sys.stderr)
         sys.exit(1)
 
-    if write_overlay and frames_dir is not None:
-        input_pattern = os.path.join(frames_dir, "frame_%06d.png")
-        cmd = [
-            "ffmpeg", "-y",
-            "-framerate", str(video_fps),
-            "-i", input_pattern,
-            "-c:v", "libx264",
-            "-pix_fmt", "yuv420p",
-            out_video_path,
-        ]
-        result = subprocess.run(cmd)
-        shutil.rmtree(frames_dir, ignore_errors=True)
-        if result.returncode != 0:
-            print("Error: ffmpeg failed to create overlay video.", file=sys.stderr)
-            sys.exit(result.returncode)
-
     data = {"video_path": video_path, "video_fps": video_fps, "frames": frames_out}
     os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
-    with open(out_path, "w") as f:
-        json.dump(data, f, indent=2)
+    if orjson is not None:
+        with open(out_path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 if args.pretty else 0))
+    else:
+        with open(out_path, "w") as f:
+            json.dump(data, f, indent=2 if args.pretty else None, separators=None if args.pretty else (",", ":"))
 
     print(f"Wrote {len(frames_out)} frames to {out_path}")
     if write_overlay: